@@ -3,29 +3,120 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from movie_recommender import MovieRecommender
 from database import DatabaseManager
-import os
-from dotenv import load_dotenv
+from json_provider import ORJSONProvider
+from concurrent.futures import Future
+import logging
+import orjson
+import threading
+from config import TMDB_API_KEY, TMDB_CACHE_PATH, DATABASE_PATH, CORS_ORIGINS, CORS_MAX_AGE, DEBUG
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Error bodies never change, so serialize them once
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+def prebuilt_error(message, status):
+    """Serialize a fixed error response once, for returning from any request"""
+    return orjson.dumps({"success": False, "error": message}), status, JSON_HEADERS
+
+INTERNAL_ERROR_RESPONSE = prebuilt_error("Internal server error", 500)
+RECOMMEND_ERROR_RESPONSE = prebuilt_error("Internal server error. Please try again later.", 500)
+MISSING_MOVIE_NAME_RESPONSE = prebuilt_error("Missing required field: movieName", 400)
+WEIGHT_RANGE_RESPONSE = prebuilt_error("Weights must be between 0 and 1", 400)
+WEIGHT_SUM_RESPONSE = prebuilt_error("Weights must sum to 1.0", 400)
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
 # FIX: More specific CORS configuration
 CORS(app, resources={
     r"/api/*": {
-        "origins": ["http://localhost:3000", "http://127.0.0.1:3000"],
+        "origins": CORS_ORIGINS,
         "methods": ["GET", "POST", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
+        "allow_headers": ["Content-Type"],
+        "max_age": CORS_MAX_AGE
     }
 })
 
+@app.before_request
+def answer_preflight():
+    """
+    Answer CORS preflight requests after URL matching but before any view
+    logic runs; unknown paths fall through so they still get their 404
+    """
+    if request.method != 'OPTIONS' or request.url_rule is None:
+        return None
+    
+    origin = request.headers.get('Origin')
+    if origin not in CORS_ORIGINS or not request.path.startswith('/api/'):
+        return None  # Let flask-cors handle (and reject) it as usual
+    
+    return '', 204, {
+        'Access-Control-Allow-Origin': origin,
+        'Access-Control-Allow-Methods': 'GET, POST, DELETE, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type',
+        'Access-Control-Max-Age': str(CORS_MAX_AGE),
+        'Vary': 'Origin'
+    }
+
 # Initialize the recommender with API key
-TMDB_API_KEY = os.getenv('TMDB_API_KEY', 'YOUR_API_KEY_HERE')
-recommender = MovieRecommender(TMDB_API_KEY)
+recommender = MovieRecommender(TMDB_API_KEY, TMDB_CACHE_PATH)
 
 # Initialize database
-db = DatabaseManager()
+db = DatabaseManager(DATABASE_PATH)
+
+# Recommendation requests currently being computed, keyed by their inputs
+_inflight_recommendations = {}
+_inflight_lock = threading.Lock()
+
+def get_recommendations_coalesced(movie_name, **options):
+    """
+    Get recommendations, sharing one computation between identical requests
+    that arrive while it is still running
+    """
+    # movie_id is not used by get_recommendations, so it stays out of the key;
+    # the other values are stringified so any JSON input can be hashed
+    key = (str(movie_name).strip().lower(),) + tuple(
+        (name, str(value)) for name, value in sorted(options.items()) if name != 'movie_id'
+    )
+    
+    with _inflight_lock:
+        future = _inflight_recommendations.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            _inflight_recommendations[key] = future
+    
+    if not is_owner:
+        return future.result()
+    
+    try:
+        result = recommender.get_recommendations(movie_name=movie_name, **options)
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight_recommendations[key]
+
+# History and statistics can be cached by the browser but must be revalidated
+# on every use, since the UI refetches them right after its own writes
+HISTORY_CACHE_CONTROL = 'private, no-cache'
+
+def conditional_json(etag, build_body):
+    """
+    Return 304 Not Modified if the client already holds this ETag,
+    otherwise the JSON from build_body(etag); either way tagged for revalidation
+    """
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(build_body(etag))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = HISTORY_CACHE_CONTROL
+    return response
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -41,13 +132,11 @@ def recommend():
     Get movie recommendations
     """
     try:
-        data = request.get_json()
+        # Malformed or non-object bodies are rejected like a missing field
+        data = request.get_json(silent=True)
         
-        if not data or 'movieName' not in data:
-            return jsonify({
-                "success": False,
-                "error": "Missing required field: movieName"
-            }), 400
+        if not isinstance(data, dict) or 'movieName' not in data:
+            return MISSING_MOVIE_NAME_RESPONSE
         
         movie_name = data['movieName']
         movie_id = data.get('movieId')  # Optional: specific movie ID
@@ -55,22 +144,16 @@ def recommend():
         genre_weight = float(data.get('genreWeight', 0.7))
         overview_weight = float(data.get('overviewWeight', 0.3))
         
-        # Validate weights
-        if genre_weight < 0 or genre_weight > 1 or overview_weight < 0 or overview_weight > 1:
-            return jsonify({
-                "success": False,
-                "error": "Weights must be between 0 and 1"
-            }), 400
+        # Validate weights (chained comparisons also reject NaN)
+        if not (0.0 <= genre_weight <= 1.0 and 0.0 <= overview_weight <= 1.0):
+            return WEIGHT_RANGE_RESPONSE
         
-        if abs(genre_weight + overview_weight - 1.0) > 0.01:
-            return jsonify({
-                "success": False,
-                "error": "Weights must sum to 1.0"
-            }), 400
+        if not abs(genre_weight + overview_weight - 1.0) <= 0.01:
+            return WEIGHT_SUM_RESPONSE
         
         # Get recommendations
-        result = recommender.get_recommendations(
-            movie_name=movie_name,
+        result = get_recommendations_coalesced(
+            movie_name,
             movie_id=movie_id,
             language=language,
             num_recommendations=5,
@@ -87,23 +170,19 @@ def recommend():
                 genre_weight=genre_weight,
                 overview_weight=overview_weight
             )
-            result['history_id'] = history_id
+            # The result may be shared with other requests, so don't modify it
+            result = {**result, 'history_id': history_id}
         
         return jsonify(result), 200
         
-    except ValueError as ve:
+    except (TypeError, ValueError) as ve:
         return jsonify({
             "success": False,
             "error": f"Invalid input: {str(ve)}"
         }), 400
-    except Exception as e:
-        print(f"Error in recommend endpoint: {e}")
-        import traceback
-        traceback.print_exc()  # Print full error for debugging
-        return jsonify({
-            "success": False,
-            "error": "Internal server error. Please try again later."
-        }), 500
+    except Exception:
+        logger.exception("Error in recommend endpoint")
+        return RECOMMEND_ERROR_RESPONSE
 
 @app.route('/api/search-movies', methods=['GET'])
 def search_movie():
@@ -128,36 +207,29 @@ def search_movie():
             "count": len(movie) if isinstance(movie, list) else (1 if movie else 0)
         }), 200
             
-    except Exception as e:
-        print(f"Error in search endpoint: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            "success": False,
-            "error": "Internal server error"
-        }), 500
+    except Exception:
+        logger.exception("Error in search endpoint")
+        return INTERNAL_ERROR_RESPONSE
 
 @app.route('/api/history', methods=['GET'])
 def get_history():
     """Get recent recommendation history"""
     try:
         limit = request.args.get('limit', 10, type=int)
-        history = db.get_recent_history(limit=limit)
         
-        return jsonify({
-            "success": True,
-            "history": history,
-            "count": len(history)
-        }), 200
+        def build_body(version):
+            history = db.get_recent_history(limit=limit, version=version)
+            return {
+                "success": True,
+                "history": history,
+                "count": len(history)
+            }
         
-    except Exception as e:
-        print(f"Error in history endpoint: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            "success": False,
-            "error": "Internal server error"
-        }), 500
+        return conditional_json(db.get_history_version(), build_body)
+        
+    except Exception:
+        logger.exception("Error in history endpoint")
+        return INTERNAL_ERROR_RESPONSE
 
 @app.route('/api/history/<int:history_id>', methods=['GET'])
 def get_history_details(history_id):
@@ -176,34 +248,22 @@ def get_history_details(history_id):
                 "error": "History not found"
             }), 404
             
-    except Exception as e:
-        print(f"Error in history details endpoint: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            "success": False,
-            "error": "Internal server error"
-        }), 500
+    except Exception:
+        logger.exception("Error in history details endpoint")
+        return INTERNAL_ERROR_RESPONSE
 
 @app.route('/api/statistics', methods=['GET'])
 def get_statistics():
     """Get overall statistics"""
     try:
-        stats = db.get_statistics()
-        
-        return jsonify({
+        return conditional_json(db.get_history_version(), lambda version: {
             "success": True,
-            "statistics": stats
-        }), 200
+            "statistics": db.get_statistics(version=version)
+        })
         
-    except Exception as e:
-        print(f"Error in statistics endpoint: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            "success": False,
-            "error": "Internal server error"
-        }), 500
+    except Exception:
+        logger.exception("Error in statistics endpoint")
+        return INTERNAL_ERROR_RESPONSE
 
 @app.route('/api/history/<int:history_id>', methods=['DELETE'])
 def delete_history(history_id):
@@ -222,14 +282,9 @@ def delete_history(history_id):
                 "error": "Failed to delete history"
             }), 500
             
-    except Exception as e:
-        print(f"Error in delete history endpoint: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            "success": False,
-            "error": "Internal server error"
-        }), 500
+    except Exception:
+        logger.exception("Error in delete history endpoint")
+        return INTERNAL_ERROR_RESPONSE
 
 @app.route('/api/history/clear', methods=['DELETE'])
 def clear_history():
@@ -248,14 +303,9 @@ def clear_history():
                 "error": "Failed to clear history"
             }), 500
             
-    except Exception as e:
-        print(f"Error in clear history endpoint: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            "success": False,
-            "error": "Internal server error"
-        }), 500
+    except Exception:
+        logger.exception("Error in clear history endpoint")
+        return INTERNAL_ERROR_RESPONSE
 
 @app.errorhandler(404)
 def not_found(e):
@@ -266,12 +316,12 @@ def not_found(e):
 
 @app.errorhandler(500)
 def internal_error(e):
-    return jsonify({
-        "success": False,
-        "error": "Internal server error"
-    }), 500
+    return INTERNAL_ERROR_RESPONSE
 
 if __name__ == '__main__':
+    # Production servers configure logging themselves, so only set it up here
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    
     print("="*60)
     print("Starting Movie Recommender API...")
     print("="*60)
@@ -283,9 +333,13 @@ if __name__ == '__main__':
     else:
         print(f"✓ Using TMDb API Key: {TMDB_API_KEY[:10]}...")
     
-    print(f"✓ Database initialized at: movie_recommendations.db")
+    print(f"✓ Database initialized at: {DATABASE_PATH}")
     print(f"✓ Server running on http://localhost:5000")
     print(f"✓ CORS enabled for http://localhost:3000")
     print("="*60)
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Production runs under granian or gunicorn, see wsgi.py
+    if not DEBUG:
+        print("⚠️  Development server! Use granian or gunicorn in production (see wsgi.py)")
+    
+    app.run(debug=DEBUG, host='0.0.0.0', port=5000)
\ No newline at end of file
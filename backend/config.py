@@ -0,0 +1,21 @@
+# config.py
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# TMDb API key, get yours from: https://www.themoviedb.org/settings/api
+TMDB_API_KEY = os.getenv('TMDB_API_KEY', 'YOUR_API_KEY_HERE')
+
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'movie_recommendations.db')
+
+# On-disk TMDb response cache; '.sqlite' is appended to the name
+TMDB_CACHE_PATH = os.getenv('TMDB_CACHE_PATH', 'tmdb_cache')
+
+# Frontend origins allowed to call the API
+CORS_ORIGINS = ["http://localhost:3000", "http://127.0.0.1:3000"]
+CORS_MAX_AGE = 86400  # Let browsers reuse a preflight result for a day
+
+# The debugger and reloader are for local development only
+DEBUG = os.getenv('FLASK_ENV') == 'development'
@@ -1,26 +1,101 @@
 # database.py
 import sqlite3
-import json
+import orjson
+import threading
 from datetime import datetime
 from typing import List, Dict, Optional
+from cachetools import TTLCache
+
+# Recommended movies are removed together with their history entry
+RECOMMENDED_MOVIES_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        history_id INTEGER NOT NULL,
+        movie_title TEXT NOT NULL,
+        original_title TEXT,
+        language TEXT,
+        release_date TEXT,
+        rating REAL,
+        overview TEXT,
+        similarity_score REAL,
+        genre_similarity REAL,
+        overview_similarity REAL,
+        genres TEXT,
+        recommendation_rank INTEGER,
+        FOREIGN KEY (history_id) REFERENCES recommendation_history(id) ON DELETE CASCADE
+    )
+'''
+
+# History and statistics reads are served from memory for this long (seconds)
+READ_CACHE_TTL = 30
+READ_CACHE_SIZE = 128
 
 class DatabaseManager:
     def __init__(self, db_path: str = "movie_recommendations.db"):
         """Initialize database connection and create tables if they don't exist"""
         self.db_path = db_path
+        # One long-lived connection per thread instead of one per call
+        self._local = threading.local()
+        # Cached reads, keyed by the history version so writes from any
+        # process miss the cache; also cleared whenever this manager writes
+        self._cache = TTLCache(maxsize=READ_CACHE_SIZE, ttl=READ_CACHE_TTL)
+        self._cache_lock = threading.Lock()
+        self._cache_generation = 0
         self.init_database()
     
     def get_connection(self):
-        """Get a database connection"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        """Get this thread's database connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+            # These settings are per connection, so apply them on every open
+            conn.execute('PRAGMA synchronous=NORMAL')  # Safe with WAL, no fsync per commit
+            conn.execute('PRAGMA busy_timeout=5000')
+            conn.execute('PRAGMA foreign_keys=ON')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            conn.execute('PRAGMA cache_size=-40000')  # ~40 MB page cache
+            conn.execute('PRAGMA mmap_size=268435456')  # 256 MB memory-mapped I/O
+            self._local.conn = conn
         return conn
     
+    def close(self):
+        """Close this thread's database connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
+    def _cached(self, key, loader):
+        """Return a cached read result, calling loader() on a miss"""
+        with self._cache_lock:
+            if key in self._cache:
+                return self._cache[key]
+            generation = self._cache_generation
+        
+        value = loader()
+        
+        with self._cache_lock:
+            # Don't store a result that a concurrent write has made stale
+            if generation == self._cache_generation:
+                self._cache[key] = value
+        return value
+    
+    def _invalidate_cache(self):
+        """Drop all cached reads after a write"""
+        with self._cache_lock:
+            self._cache.clear()
+            self._cache_generation += 1
+    
     def init_database(self):
         """Create tables if they don't exist"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        # WAL lets readers run alongside the writer; it is persisted in the
+        # database file, so this only needs to run once
+        cursor.execute('PRAGMA journal_mode=WAL')
+        
         # Create recommendations history table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS recommendation_history (
@@ -37,29 +112,71 @@ class DatabaseManager:
         ''')
         
         # Create recommended movies table (one-to-many relationship)
+        cursor.execute(RECOMMENDED_MOVIES_SCHEMA.format(table='recommended_movies'))
+        self._migrate_cascade_delete(conn)
+        
+        # Indexes for history lookups, recency ordering and grouping
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS recommended_movies (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                history_id INTEGER NOT NULL,
-                movie_title TEXT NOT NULL,
-                original_title TEXT,
-                language TEXT,
-                release_date TEXT,
-                rating REAL,
-                overview TEXT,
-                similarity_score REAL,
-                genre_similarity REAL,
-                overview_similarity REAL,
-                genres TEXT,
-                recommendation_rank INTEGER,
-                FOREIGN KEY (history_id) REFERENCES recommendation_history(id)
+            CREATE INDEX IF NOT EXISTS idx_recmovies_history
+            ON recommended_movies(history_id, recommendation_rank)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_history_timestamp
+            ON recommendation_history(timestamp DESC)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_history_movie
+            ON recommendation_history(searched_movie_name)
+        ''')
+        
+        # Single-row counter bumped by triggers on every history insert or
+        # delete, so any process can detect changes with one O(1) read
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS history_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
             )
         ''')
+        cursor.execute('INSERT OR IGNORE INTO history_version (id, version) VALUES (1, 0)')
+        for event in ('INSERT', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS history_version_{event.lower()}
+                AFTER {event} ON recommendation_history
+                BEGIN
+                    UPDATE history_version SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+        
+        # TMDb responses are cached by requests-cache now; drop the table
+        # that older versions kept search results in
+        cursor.execute('DROP TABLE IF EXISTS search_cache')
         
         conn.commit()
-        conn.close()
         print("✓ Database initialized successfully")
     
+    def _migrate_cascade_delete(self, conn):
+        """Rebuild recommended_movies from older databases so its foreign key cascades deletes"""
+        foreign_keys = conn.execute('PRAGMA foreign_key_list(recommended_movies)').fetchall()
+        if all(fk['on_delete'] == 'CASCADE' for fk in foreign_keys):
+            return
+        
+        # SQLite cannot alter a foreign key in place, so copy into a new table
+        conn.commit()
+        conn.execute('PRAGMA foreign_keys=OFF')
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(RECOMMENDED_MOVIES_SCHEMA.format(table='recommended_movies_new'))
+            conn.execute('INSERT INTO recommended_movies_new SELECT * FROM recommended_movies')
+            conn.execute('DROP TABLE recommended_movies')
+            conn.execute('ALTER TABLE recommended_movies_new RENAME TO recommended_movies')
+            conn.commit()
+            print("✓ Migrated recommended_movies to cascading deletes")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute('PRAGMA foreign_keys=ON')
+    
     def save_recommendation(self, searched_movie: Dict, recommendations: List[Dict], 
                           language: str, genre_weight: float, overview_weight: float) -> int:
         """
@@ -67,36 +184,31 @@ class DatabaseManager:
         Returns the history_id of the saved record
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            # Insert into recommendation_history
-            cursor.execute('''
-                INSERT INTO recommendation_history 
-                (searched_movie_name, searched_movie_year, searched_movie_genres, 
-                 language_preference, genre_weight, overview_weight, num_recommendations)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                searched_movie['title'],
-                searched_movie.get('year', 'N/A'),
-                json.dumps(searched_movie.get('genres', [])),
-                language,
-                genre_weight,
-                overview_weight,
-                len(recommendations)
-            ))
-            
-            history_id = cursor.lastrowid
-            
-            # Insert recommended movies
-            for rank, rec in enumerate(recommendations, 1):
-                cursor.execute('''
-                    INSERT INTO recommended_movies
-                    (history_id, movie_title, original_title, language, release_date,
-                     rating, overview, similarity_score, genre_similarity, 
-                     overview_similarity, genres, recommendation_rank)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            # One transaction for the whole save; commits on success, rolls back on error
+            with conn:
+                # Take the write lock up front
+                conn.execute('BEGIN IMMEDIATE')
+                
+                # Insert into recommendation_history
+                history_id = conn.execute('''
+                    INSERT INTO recommendation_history 
+                    (searched_movie_name, searched_movie_year, searched_movie_genres, 
+                     language_preference, genre_weight, overview_weight, num_recommendations)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
                 ''', (
+                    searched_movie['title'],
+                    searched_movie.get('year', 'N/A'),
+                    orjson.dumps(searched_movie.get('genres', [])).decode(),
+                    language,
+                    genre_weight,
+                    overview_weight,
+                    len(recommendations)
+                )).lastrowid
+                
+                # Insert recommended movies in a single batch
+                rows = [(
                     history_id,
                     rec['title'],
                     rec.get('original_title', rec['title']),
@@ -107,29 +219,43 @@ class DatabaseManager:
                     rec.get('similarity', 0),
                     rec.get('genre_similarity', 0),
                     rec.get('overview_similarity', 0),
-                    json.dumps(rec.get('genres', [])),
+                    orjson.dumps(rec.get('genres', [])).decode(),
                     rank
-                ))
+                ) for rank, rec in enumerate(recommendations, 1)]
+                
+                conn.executemany('''
+                    INSERT INTO recommended_movies
+                    (history_id, movie_title, original_title, language, release_date,
+                     rating, overview, similarity_score, genre_similarity, 
+                     overview_similarity, genres, recommendation_rank)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
             
-            conn.commit()
+            self._invalidate_cache()
             print(f"✓ Saved recommendation history (ID: {history_id})")
             return history_id
             
         except Exception as e:
-            conn.rollback()
             print(f"Error saving to database: {e}")
             return -1
-        finally:
-            conn.close()
     
-    def get_recent_history(self, limit: int = 10) -> List[Dict]:
-        """Get recent recommendation history"""
+    def get_recent_history(self, limit: int = 10, version: Optional[str] = None) -> List[Dict]:
+        """
+        Get recent recommendation history. Pass the version already read for
+        this request to avoid reading it again.
+        """
+        key = ('history', limit, version or self.get_history_version())
+        return self._cached(key, lambda: self._load_recent_history(limit))
+    
+    def _load_recent_history(self, limit: int) -> List[Dict]:
+        """Query recent recommendation history"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        # Columns are aliased to the API's keys so each row converts directly
         cursor.execute('''
-            SELECT id, searched_movie_name, searched_movie_year, 
-                   searched_movie_genres, language_preference,
+            SELECT id, searched_movie_name AS searched_movie, searched_movie_year AS year, 
+                   searched_movie_genres AS genres, language_preference AS language,
                    genre_weight, overview_weight, num_recommendations,
                    timestamp
             FROM recommendation_history
@@ -137,25 +263,22 @@ class DatabaseManager:
             LIMIT ?
         ''', (limit,))
         
-        rows = cursor.fetchall()
-        conn.close()
-        
-        history = []
-        for row in rows:
-            history.append({
-                'id': row['id'],
-                'searched_movie': row['searched_movie_name'],
-                'year': row['searched_movie_year'],
-                'genres': json.loads(row['searched_movie_genres']),
-                'language': row['language_preference'],
-                'genre_weight': row['genre_weight'],
-                'overview_weight': row['overview_weight'],
-                'num_recommendations': row['num_recommendations'],
-                'timestamp': row['timestamp']
-            })
+        history = [dict(row) for row in cursor.fetchall()]
+        for entry in history:
+            entry['genres'] = orjson.loads(entry['genres'])
         
         return history
     
+    def get_history_version(self) -> str:
+        """
+        Get a tag that changes whenever history is added or deleted.
+        Read from the history_version counter on every call, so writes made
+        by other worker processes are seen at once.
+        """
+        conn = self.get_connection()
+        row = conn.execute('SELECT version FROM history_version WHERE id = 1').fetchone()
+        return f"{row['version']:x}"
+    
     def get_history_details(self, history_id: int) -> Optional[Dict]:
         """Get detailed information about a specific recommendation history"""
         conn = self.get_connection()
@@ -168,92 +291,86 @@ class DatabaseManager:
         
         history_row = cursor.fetchone()
         if not history_row:
-            conn.close()
             return None
         
-        # Get recommended movies
+        # Get recommended movies, aliased to the API's keys
         cursor.execute('''
-            SELECT * FROM recommended_movies 
+            SELECT movie_title AS title, original_title, language, release_date,
+                   rating, overview, similarity_score AS similarity, genre_similarity,
+                   overview_similarity, genres, recommendation_rank AS rank
+            FROM recommended_movies 
             WHERE history_id = ?
             ORDER BY recommendation_rank
         ''', (history_id,))
         
-        movie_rows = cursor.fetchall()
-        conn.close()
+        recommendations = [dict(row) for row in cursor.fetchall()]
+        for movie in recommendations:
+            movie['genres'] = orjson.loads(movie['genres'])
         
         # Build result
-        result = {
+        return {
             'id': history_row['id'],
             'searched_movie': {
                 'title': history_row['searched_movie_name'],
                 'year': history_row['searched_movie_year'],
-                'genres': json.loads(history_row['searched_movie_genres'])
+                'genres': orjson.loads(history_row['searched_movie_genres'])
             },
             'language': history_row['language_preference'],
             'genre_weight': history_row['genre_weight'],
             'overview_weight': history_row['overview_weight'],
             'timestamp': history_row['timestamp'],
-            'recommendations': []
+            'recommendations': recommendations
         }
-        
-        for movie in movie_rows:
-            result['recommendations'].append({
-                'title': movie['movie_title'],
-                'original_title': movie['original_title'],
-                'language': movie['language'],
-                'release_date': movie['release_date'],
-                'rating': movie['rating'],
-                'overview': movie['overview'],
-                'similarity': movie['similarity_score'],
-                'genre_similarity': movie['genre_similarity'],
-                'overview_similarity': movie['overview_similarity'],
-                'genres': json.loads(movie['genres']),
-                'rank': movie['recommendation_rank']
-            })
-        
-        return result
     
-    def get_statistics(self) -> Dict:
-        """Get overall statistics from the database"""
+    def get_statistics(self, version: Optional[str] = None) -> Dict:
+        """Get overall statistics from the database, optionally at an already-read version"""
+        key = ('statistics', version or self.get_history_version())
+        return self._cached(key, self._load_statistics)
+    
+    def _load_statistics(self) -> Dict:
+        """Query overall statistics in one read transaction"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Total searches
-        cursor.execute('SELECT COUNT(*) as count FROM recommendation_history')
-        total_searches = cursor.fetchone()['count']
-        
-        # Total recommendations given
-        cursor.execute('SELECT COUNT(*) as count FROM recommended_movies')
-        total_recommendations = cursor.fetchone()['count']
+        # Read everything from one snapshot
+        cursor.execute('BEGIN')
+        try:
+            # Total searches and recommendations given
+            cursor.execute('''
+                SELECT (SELECT COUNT(*) FROM recommendation_history) as total_searches,
+                       (SELECT COUNT(*) FROM recommended_movies) as total_recommendations
+            ''')
+            totals = cursor.fetchone()
+            
+            # Most searched movie
+            cursor.execute('''
+                SELECT searched_movie_name, COUNT(*) as count
+                FROM recommendation_history
+                GROUP BY searched_movie_name
+                ORDER BY count DESC
+                LIMIT 1
+            ''')
+            most_searched_row = cursor.fetchone()
+            
+            # Language preference distribution
+            cursor.execute('''
+                SELECT language_preference, COUNT(*) as count
+                FROM recommendation_history
+                GROUP BY language_preference
+                ORDER BY count DESC
+            ''')
+            language_dist = [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.commit()
         
-        # Most searched movie
-        cursor.execute('''
-            SELECT searched_movie_name, COUNT(*) as count
-            FROM recommendation_history
-            GROUP BY searched_movie_name
-            ORDER BY count DESC
-            LIMIT 1
-        ''')
-        most_searched_row = cursor.fetchone()
         most_searched = {
             'movie': most_searched_row['searched_movie_name'] if most_searched_row else 'N/A',
             'count': most_searched_row['count'] if most_searched_row else 0
         }
         
-        # Language preference distribution
-        cursor.execute('''
-            SELECT language_preference, COUNT(*) as count
-            FROM recommendation_history
-            GROUP BY language_preference
-            ORDER BY count DESC
-        ''')
-        language_dist = [dict(row) for row in cursor.fetchall()]
-        
-        conn.close()
-        
         return {
-            'total_searches': total_searches,
-            'total_recommendations': total_recommendations,
+            'total_searches': totals['total_searches'],
+            'total_recommendations': totals['total_recommendations'],
             'most_searched': most_searched,
             'language_distribution': language_dist
         }
@@ -261,35 +378,28 @@ class DatabaseManager:
     def delete_history(self, history_id: int) -> bool:
         """Delete a specific recommendation history"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            # Delete recommended movies first (due to foreign key)
-            cursor.execute('DELETE FROM recommended_movies WHERE history_id = ?', (history_id,))
-            cursor.execute('DELETE FROM recommendation_history WHERE id = ?', (history_id,))
-            conn.commit()
-            conn.close()
+            # Recommended movies are removed by the ON DELETE CASCADE foreign key
+            with conn:
+                conn.execute('DELETE FROM recommendation_history WHERE id = ?', (history_id,))
+            self._invalidate_cache()
             return True
         except Exception as e:
             print(f"Error deleting history: {e}")
-            conn.rollback()
-            conn.close()
             return False
     
     def clear_all_history(self) -> bool:
         """Clear all recommendation history"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            cursor.execute('DELETE FROM recommended_movies')
-            cursor.execute('DELETE FROM recommendation_history')
-            conn.commit()
-            conn.close()
+            with conn:
+                conn.execute('DELETE FROM recommended_movies')
+                conn.execute('DELETE FROM recommendation_history')
+            self._invalidate_cache()
             print("✓ All history cleared")
             return True
         except Exception as e:
             print(f"Error clearing history: {e}")
-            conn.rollback()
-            conn.close()
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,17 @@
+# gunicorn.conf.py
+# Production server settings, used with: gunicorn -c gunicorn.conf.py wsgi:app
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Each worker process imports the app and gets its own DatabaseManager
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+
+# Threaded workers let requests waiting on TMDb overlap; every thread keeps
+# its own long-lived SQLite connection (see DatabaseManager.get_connection)
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+
+# A recommendation makes many TMDb calls, so allow more than the 30s default
+timeout = 120
+keepalive = 5
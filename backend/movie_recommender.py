@@ -1,13 +1,99 @@
 # movie_recommender.py
 import numpy as np
 import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
 from typing import List, Dict, Optional
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from cachetools import TTLCache
+import threading
 import re
 import time
 
+_PUNCT_RE = re.compile(r'[^a-z0-9\s]')
+
+_STOP_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
+                         'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'been', 'be',
+                         'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
+                         'should', 'may', 'might', 'must', 'can', 'this', 'that', 'these', 'those'})
+
+@lru_cache(maxsize=4096)
+def _tokenize(text: str) -> tuple:
+    """
+    Lowercase, strip punctuation and drop stop words from a text.
+    Cached because the same overviews are tokenized for the vocabulary, for
+    every TF-IDF vector and again whenever a movie shows up in later requests.
+    """
+    tokens = _PUNCT_RE.sub('', text.lower()).split()
+    return tuple(t for t in tokens if t not in _STOP_WORDS and len(t) > 2)
+
+# Keep-alive connections to TMDb; enough for every fetch thread at once
+HTTP_POOL_SIZE = 16
+
+# TMDb allows about 40 requests per 10 seconds per API key. Each worker
+# process paces itself at this rate; when several are busy at once, TMDb's
+# 429 responses make them all back off for the Retry-After it sends
+TMDB_REQUESTS_PER_SECOND = 4.0
+TMDB_REQUEST_BURST = 8
+TMDB_MAX_RETRY_AFTER = 10  # seconds
+
+# Concurrent TMDb requests when fetching candidate details. Cold fetches are
+# paced by the rate limit above, so more threads than the burst can't go out
+# at once; these overlap the network latency of each request
+DETAIL_FETCH_WORKERS = TMDB_REQUEST_BURST
+
+class TokenBucket:
+    """Thread-safe rate limiter allowing bursts of `burst` calls, refilled at `rate` per second"""
+    
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        """Add the tokens earned since the last update; call with the lock held"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def acquire(self):
+        """Take a token, sleeping only if the bucket is empty"""
+        with self._lock:
+            self._refill()
+            # Reserve the token now so waiting threads are served in order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        
+        if wait:
+            time.sleep(wait)
+    
+    def pause(self, seconds: float):
+        """Make every caller wait at least `seconds` before its next token"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+# In-memory caches of TMDb responses (entries, seconds)
+DETAILS_CACHE_SIZE = 4096
+SEARCH_CACHE_SIZE = 2048
+TMDB_CACHE_TTL = 3600
+
+# On-disk cache of TMDb responses, kept across restarts (seconds)
+TMDB_DISK_CACHE_TTL = 7 * 24 * 3600
+
 class MovieRecommender:
-    def __init__(self, api_key: str):
+    # Common genre IDs in TMDb, one feature per genre
+    _ALL_GENRES = np.array([28, 12, 16, 35, 80, 99, 18, 10751, 14, 36, 27, 10402, 9648,
+                            10749, 878, 10770, 53, 10752, 37], dtype=np.int32)
+    
+    # Shared by all instances and threads in this process
+    _bucket = TokenBucket(TMDB_REQUESTS_PER_SECOND, TMDB_REQUEST_BURST)
+    
+    def __init__(self, api_key: str, cache_name: str = 'tmdb_cache'):
         """
         Initialize the Movie Recommender with TMDb API
         Get your free API key from: https://www.themoviedb.org/settings/api
@@ -15,19 +101,60 @@ class MovieRecommender:
         # FIX: Use the api_key parameter instead of hardcoded value
         self.api_key = api_key
         self.base_url = "https://api.themoviedb.org/3"
-        self.session = requests.Session()
+        # Responses are cached in SQLite (<cache_name>.sqlite); api_key is
+        # ignored in cache keys and redacted from stored responses by default
+        self.session = requests_cache.CachedSession(
+            cache_name, backend='sqlite', expire_after=TMDB_DISK_CACHE_TTL
+        )
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
             'Accept-Language': 'en-US,en;q=0.9'
         })
+        # Sent with every request instead of being added to each call's params
+        self.session.params = {'api_key': self.api_key}
+        
+        # Reuse TLS connections across the parallel fetches; retries are
+        # handled in _make_request
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+        self.session.mount('https://', adapter)
+        
+        # Successful lookups are reused across requests; failures are retried
+        self._details_cache = TTLCache(maxsize=DETAILS_CACHE_SIZE, ttl=TMDB_CACHE_TTL)
+        self._search_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=TMDB_CACHE_TTL)
+        self._cache_lock = threading.Lock()
+    
+    def _cached(self, cache: TTLCache, key, fetch):
+        """Return cache[key], calling fetch() on a miss and caching any non-None result"""
+        with self._cache_lock:
+            value = cache.get(key)
+        if value is not None:
+            return value
+        
+        value = fetch()
+        if value is not None:
+            with self._cache_lock:
+                cache[key] = value
+        return value
     
     def _make_request(self, url: str, params: dict, max_retries: int = 3) -> Optional[dict]:
         """Make API request with retry logic"""
         for attempt in range(max_retries):
             try:
-                time.sleep(0.5)  # Small delay between requests
-                response = self.session.get(url, params=params, timeout=30)
+                # Try the disk cache alone first; only a miss (504) goes to
+                # TMDb, so only real network calls wait for a rate limit token
+                response = self.session.get(url, params=params, timeout=30, only_if_cached=True)
+                if response.status_code == 504:
+                    self._bucket.acquire()
+                    response = self.session.get(url, params=params, timeout=30)
+                if response.status_code == 429 and attempt < max_retries - 1:
+                    # Other workers share the key's budget; hold back every
+                    # thread here for as long as TMDb asks
+                    wait = self._retry_after(response)
+                    print(f"Rate limited by TMDb, retrying in {wait:g}s (attempt {attempt + 1}/{max_retries})")
+                    self._bucket.pause(wait)
+                    continue
                 response.raise_for_status()
                 return response.json()
             except requests.exceptions.ConnectionError as e:
@@ -44,12 +171,28 @@ class MovieRecommender:
                 return None
         return None
     
+    @staticmethod
+    def _retry_after(response) -> float:
+        """Seconds to wait according to a 429 response's Retry-After header"""
+        try:
+            seconds = float(response.headers.get('Retry-After', 1))
+        except ValueError:  # HTTP-date form; TMDb sends seconds
+            seconds = 1.0
+        return min(max(seconds, 0.0), TMDB_MAX_RETRY_AFTER)
+    
     def search_movie(self, movie_name: str) -> Optional[Dict]:
         """Search for a movie by name"""
+        return self._cached(self._search_cache, str(movie_name).strip().lower(),
+                            lambda: self._fetch_search_result(movie_name))
+    
+    def _fetch_search_result(self, movie_name: str) -> Optional[Dict]:
+        """Search TMDb for a movie and return the top result"""
         url = f"{self.base_url}/search/movie"
+        # Only the top result is used, so ask for the first page alone
         params = {
-            "api_key": self.api_key,
-            "query": movie_name
+            "query": movie_name,
+            "include_adult": "false",
+            "page": 1
         }
         
         try:
@@ -70,9 +213,13 @@ class MovieRecommender:
     
     def get_movie_details(self, movie_id: int) -> Optional[Dict]:
         """Get detailed information about a movie"""
+        return self._cached(self._details_cache, movie_id,
+                            lambda: self._fetch_movie_details(movie_id))
+    
+    def _fetch_movie_details(self, movie_id: int) -> Optional[Dict]:
+        """Fetch a movie's details from TMDb"""
         url = f"{self.base_url}/movie/{movie_id}"
         params = {
-            "api_key": self.api_key,
             "append_to_response": "keywords,credits"
         }
         
@@ -85,94 +232,66 @@ class MovieRecommender:
     
     def create_genre_vector(self, movie: Dict) -> np.ndarray:
         """Create a genre feature vector from movie data"""
-        genre_ids = [g['id'] for g in movie.get('genres', [])]
-        
-        # Common genre IDs in TMDb
-        all_genres = [28, 12, 16, 35, 80, 99, 18, 10751, 14, 36, 27, 10402, 9648, 10749, 878, 10770, 53, 10752, 37]
-        genre_vector = np.array([1 if gid in genre_ids else 0 for gid in all_genres], dtype=float)
-        
-        return genre_vector
+        genre_ids = np.fromiter((g['id'] for g in movie.get('genres', [])), dtype=np.int32)
+        return np.isin(self._ALL_GENRES, genre_ids).astype(np.float32)
     
     def preprocess_text(self, text: str) -> List[str]:
         """Preprocess text: lowercase, remove punctuation, tokenize"""
         if not text:
             return []
         
-        text = text.lower()
-        text = re.sub(r'[^a-z0-9\s]', '', text)
-        tokens = text.split()
-        
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
-                     'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'been', 'be',
-                     'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
-                     'should', 'may', 'might', 'must', 'can', 'this', 'that', 'these', 'those'}
-        
-        tokens = [t for t in tokens if t not in stop_words and len(t) > 2]
-        
-        return tokens
+        return list(_tokenize(text))
     
-    def create_tfidf_vector(self, text: str, vocabulary: Dict[str, int], idf: Dict[str, float]) -> np.ndarray:
-        """Create TF-IDF vector for a text"""
-        tokens = self.preprocess_text(text)
-        
-        tf = Counter(tokens)
-        total_terms = len(tokens) if tokens else 1
-        
-        vector = np.zeros(len(vocabulary))
-        for term, count in tf.items():
-            if term in vocabulary:
-                idx = vocabulary[term]
-                tf_value = count / total_terms
-                idf_value = idf.get(term, 0)
-                vector[idx] = tf_value * idf_value
-        
-        return vector
+    def _build_tfidf_matrix(self, texts: List[str], vocabulary: Dict[str, int],
+                            idf: Dict[str, float]) -> np.ndarray:
+        """
+        Create the TF-IDF vectors for many texts as rows of one matrix.
+        Entries are collected as CSR-style (data, indices, indptr) triplets
+        and written into the matrix with a single scatter.
+        """
+        data, indices, indptr = [], [], [0]
+        for text in texts:
+            tokens = self.preprocess_text(text)
+            total_terms = len(tokens) if tokens else 1
+            for term, count in Counter(tokens).items():
+                if term in vocabulary:
+                    indices.append(vocabulary[term])
+                    data.append(count / total_terms * idf.get(term, 0))
+            indptr.append(len(indices))
+        
+        matrix = np.zeros((len(texts), len(vocabulary)), dtype=np.float32)
+        rows = np.repeat(np.arange(len(texts)), np.diff(indptr))
+        matrix[rows, np.array(indices, dtype=np.intp)] = data
+        return matrix
     
     def build_vocabulary_and_idf(self, all_overviews: List[str]) -> tuple:
         """Build vocabulary and calculate IDF from all movie overviews"""
-        all_tokens = []
-        doc_tokens = []
-        
+        # Document frequency of every term, counted in a single pass; each
+        # document's distinct terms are added in first-seen order
+        doc_freq = Counter()
         for overview in all_overviews:
-            tokens = self.preprocess_text(overview)
-            all_tokens.extend(tokens)
-            doc_tokens.append(set(tokens))
+            doc_freq.update(dict.fromkeys(self.preprocess_text(overview), 1))
         
-        unique_terms = sorted(set(all_tokens))
-        vocabulary = {term: idx for idx, term in enumerate(unique_terms)}
+        # Cosine similarity doesn't depend on term order, so no sort is needed
+        vocabulary = {term: idx for idx, term in enumerate(doc_freq)}
         
         num_docs = len(all_overviews)
-        idf = {}
-        
-        for term in unique_terms:
-            doc_count = sum(1 for doc in doc_tokens if term in doc)
-            idf[term] = np.log(num_docs / (doc_count + 1)) + 1
+        idf = {term: np.log(num_docs / (count + 1)) + 1 for term, count in doc_freq.items()}
         
         return vocabulary, idf
     
-    def cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
-        """Calculate cosine similarity between two vectors using NumPy"""
-        dot_product = np.dot(vec1, vec2)
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
-        
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-        
-        return float(dot_product / (norm1 * norm2))
+    @staticmethod
+    def _l2_normalize(vec: np.ndarray) -> np.ndarray:
+        """Scale a vector to unit length; a zero vector stays zero"""
+        return vec / max(np.linalg.norm(vec), 1e-12)
     
-    def calculate_combined_similarity(self, input_genre_vec: np.ndarray, input_overview_vec: np.ndarray,
-                                     movie_genre_vec: np.ndarray, movie_overview_vec: np.ndarray,
-                                     genre_weight: float = 0.7, overview_weight: float = 0.3) -> tuple:
+    @staticmethod
+    def _row_norms(mat: np.ndarray) -> np.ndarray:
         """
-        Calculate combined similarity using weighted formula
-        Returns: (combined_similarity, genre_similarity, overview_similarity)
+        L2 norm of every row, computed once per matrix; einsum sums the squares
+        without materializing mat ** 2. Zero rows get 1e-12 so dividing keeps them zero.
         """
-        cosine_sim_genre = self.cosine_similarity(input_genre_vec, movie_genre_vec)
-        cosine_sim_overview = self.cosine_similarity(input_overview_vec, movie_overview_vec)
-        combined_similarity = genre_weight * cosine_sim_genre + overview_weight * cosine_sim_overview
-        
-        return combined_similarity, cosine_sim_genre, cosine_sim_overview
+        return np.sqrt(np.einsum('ij,ij->i', mat, mat)).clip(min=1e-12)
     
     def get_recommendations(self, movie_name: str, movie_id: Optional[int] = None, language: str = "mixed", 
                           num_recommendations: int = 5,
@@ -192,8 +311,23 @@ class MovieRecommender:
                 "recommendations": []
             }
         
-        # Get detailed info for input movie
-        input_movie_details = self.get_movie_details(input_movie['id'])
+        # Map language preference
+        language_map = {
+            'hindi': 'hi',
+            'english': 'en',
+            'mixed': None
+        }
+        
+        lang_code = language_map.get(language.lower())
+        
+        # The input movie's details and its similar movies are independent
+        # requests, so fetch them concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            details_future = executor.submit(self.get_movie_details, input_movie['id'])
+            similar_future = executor.submit(self._fetch_similar_movies, input_movie['id'], lang_code)
+            input_movie_details = details_future.result()
+            similar_movies = similar_future.result()
+        
         if not input_movie_details:
             return {
                 "success": False,
@@ -212,18 +346,6 @@ class MovieRecommender:
             "language": input_movie.get('original_language', 'unknown').upper()
         }
         
-        # Map language preference
-        language_map = {
-            'hindi': 'hi',
-            'english': 'en',
-            'mixed': None
-        }
-        
-        lang_code = language_map.get(language.lower())
-        
-        # Get similar movies
-        similar_movies = self._fetch_similar_movies(input_movie['id'], lang_code)
-        
         if not similar_movies:
             return {
                 "success": True,
@@ -232,40 +354,56 @@ class MovieRecommender:
                 "message": "No similar movies found for the selected language"
             }
         
-        # Get all movie details with delay to avoid connection reset
-        all_movie_details = []
-        for i, movie in enumerate(similar_movies[:30]):  # Limit to 30 for performance
-            details = self.get_movie_details(movie['id'])
-            if details:
-                all_movie_details.append((movie, details))
-            
-            # Add small delay every 5 requests
-            if (i + 1) % 5 == 0:
-                time.sleep(1)
-        
-        # Build vocabulary and IDF
-        all_overviews = [input_movie_details.get('overview', '')] + \
-                       [details.get('overview', '') for _, details in all_movie_details]
-        vocabulary, idf = self.build_vocabulary_and_idf(all_overviews)
-        
-        # Create feature vectors for input movie
-        input_genre_vec = self.create_genre_vector(input_movie_details)
-        input_overview_vec = self.create_tfidf_vector(
-            input_movie_details.get('overview', ''), vocabulary, idf
-        )
+        # Get all movie details in parallel, keeping the similar-movies order
+        candidates = similar_movies[:30]  # Limit to 30 for performance
+        with ThreadPoolExecutor(max_workers=DETAIL_FETCH_WORKERS) as executor:
+            candidate_details = executor.map(self.get_movie_details, [m['id'] for m in candidates])
+            all_movie_details = [(movie, details) for movie, details in zip(candidates, candidate_details)
+                                 if details]
+        
+        # Build vocabulary and IDF; row 0 is the input movie, the rest follow
+        # all_movie_details order
+        overviews = [input_movie_details.get('overview', '')] + \
+                    [details.get('overview', '') for _, details in all_movie_details]
+        vocabulary, idf = self.build_vocabulary_and_idf(overviews)
+        tfidf = self._build_tfidf_matrix(overviews, vocabulary, idf)
+        
+        # Create unit-length feature vectors for input movie
+        input_genre_vec = self._l2_normalize(self.create_genre_vector(input_movie_details))
+        input_overview_vec = self._l2_normalize(tfidf[0])
+        
+        # Stack the candidates' genre and TF-IDF vectors side by side in one
+        # feature matrix; genre_mat and overview_mat are views of its two blocks
+        num_movies = len(all_movie_details)
+        genre_dim = len(input_genre_vec)
+        # float32 halves the memory and bandwidth of the products; cosine
+        # scores don't need more precision
+        features = np.empty((num_movies, genre_dim + len(vocabulary)), dtype=np.float32)
+        genre_mat = features[:, :genre_dim]
+        overview_mat = features[:, genre_dim:]
+        for i, (_, details) in enumerate(all_movie_details):
+            genre_mat[i] = self.create_genre_vector(details)
+        overview_mat[:] = tfidf[1:]
+        
+        # L2-normalize every row once so cosine similarity is a plain dot product;
+        # all-zero vectors stay zero, giving a similarity of 0 as before
+        genre_mat /= self._row_norms(genre_mat)[:, None]
+        overview_mat /= self._row_norms(overview_mat)[:, None]
+        
+        # Query matrix whose two columns pick out the genre and overview blocks,
+        # so a single matrix product yields both cosine similarities for every
+        # candidate, with no division afterwards
+        queries = np.zeros((features.shape[1], 2), dtype=np.float32)
+        queries[:genre_dim, 0] = input_genre_vec
+        queries[genre_dim:, 1] = input_overview_vec
+        
+        sims = features @ queries
+        genre_sims, overview_sims = sims[:, 0], sims[:, 1]
+        combined_sims = sims @ np.array([genre_weight, overview_weight], dtype=np.float32)
         
-        # Calculate similarities
         recommendations = []
-        for movie, details in all_movie_details:
-            genre_vec = self.create_genre_vector(details)
-            overview_vec = self.create_tfidf_vector(details.get('overview', ''), vocabulary, idf)
-            
-            combined_sim, genre_sim, overview_sim = self.calculate_combined_similarity(
-                input_genre_vec, input_overview_vec,
-                genre_vec, overview_vec,
-                genre_weight, overview_weight
-            )
-            
+        for (movie, details), combined_sim, genre_sim, overview_sim in zip(
+                all_movie_details, combined_sims, genre_sims, overview_sims):
             recommendations.append({
                 'title': movie['title'],
                 'original_title': movie.get('original_title', movie['title']),
@@ -294,20 +432,18 @@ class MovieRecommender:
         all_movies = []
         
         try:
-            # Get recommendations
-            url = f"{self.base_url}/movie/{movie_id}/recommendations"
-            params = {"api_key": self.api_key, "page": 1}
-            data = self._make_request(url, params)
-            if data:
-                all_movies.extend(data.get('results', []))
+            # Get recommendations and similar movies concurrently
+            urls = [
+                f"{self.base_url}/movie/{movie_id}/recommendations",
+                f"{self.base_url}/movie/{movie_id}/similar"
+            ]
+            params = {"page": 1}
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                results = list(executor.map(lambda url: self._make_request(url, params), urls))
             
-            time.sleep(1)  # Delay between requests
-            
-            # Get similar movies
-            url = f"{self.base_url}/movie/{movie_id}/similar"
-            data = self._make_request(url, params)
-            if data:
-                all_movies.extend(data.get('results', []))
+            for data in results:
+                if data:
+                    all_movies.extend(data.get('results', []))
             
             # Filter by language if specified
             if language_code:
@@ -337,7 +473,6 @@ class MovieRecommender:
         try:
             url = f"{self.base_url}/discover/movie"
             params = {
-                "api_key": self.api_key,
                 "with_original_language": language_code,
                 "sort_by": "popularity.desc",
                 "page": 1
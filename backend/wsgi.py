@@ -0,0 +1,7 @@
+# wsgi.py
+# Entry point for production servers. Either:
+#   granian --interface wsgi --host 0.0.0.0 --port 5000 --workers 4 --blocking-threads 8 wsgi:app
+#   gunicorn -c gunicorn.conf.py wsgi:app
+# granian parses HTTP in Rust, which pays off for these small JSON endpoints
+# where framework overhead dominates; gunicorn remains the portable option.
+from app import app